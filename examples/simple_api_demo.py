@@ -6,21 +6,131 @@ No user input required - runs with hardcoded example.
 """
 
 import asyncio
+import contextlib
+import io
 import json
 import time
 from datetime import datetime
+from typing import List, Optional, TextIO
 import aiohttp
 
+try:
+    import orjson
+    _loads = orjson.loads
+    _JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    def _loads(data):
+        return json.loads(bytes(data))
+    _JSONDecodeError = json.JSONDecodeError
+
+try:
+    import ijson
+    _JSON_ERRORS = (_JSONDecodeError, ijson.JSONError)
+except ImportError:
+    ijson = None
+    _JSON_ERRORS = (_JSONDecodeError,)
+
 # API Configuration
 API_BASE_URL = "http://127.0.0.1:2024"
 ASSISTANT_ID = "Deep Researcher"
 
+# SSE data field prefix
+_DATA_PREFIX = b'data:'
+_PREFIX_LEN = len(_DATA_PREFIX)
+
+# Line assembly buffers are pooled across runs; each stream checks one out
+# exclusively and returns it when it finishes
+_LINE_BUFFER_SIZE = 1 << 20
+_LINE_BUFFER_POOL_SIZE = 4
+_line_buffer_pool: List[bytearray] = []
+
 # Hardcoded research topic (no user input needed)
 RESEARCH_TOPIC = "The impact of artificial intelligence on software development productivity"
 
-async def run_research():
+async def iter_sse_lines(response: aiohttp.ClientResponse):
+    """Yield raw lines from a streaming response, reading it in large chunks"""
+    # Take a pooled buffer if one is free; concurrent streams never share one
+    buffer = _line_buffer_pool.pop() if _line_buffer_pool else bytearray(_LINE_BUFFER_SIZE)
+    length = 0
+    try:
+        async for chunk in response.content.iter_chunked(65536):
+            # Grow the pooled buffer only when a line outgrows it
+            if length + len(chunk) > len(buffer):
+                buffer.extend(bytes(length + len(chunk) - len(buffer)))
+            buffer[length:length + len(chunk)] = chunk
+            # Only scan the newly received bytes for line breaks
+            scan_from = length
+            length += len(chunk)
+            start = 0
+            while (end := buffer.find(b'\n', scan_from, length)) != -1:
+                # Slicing copies, so yielded lines stay valid after release
+                yield buffer[start:end]
+                start = scan_from = end + 1
+            # Move the trailing partial line to the front of the buffer
+            if start:
+                buffer[:length - start] = buffer[start:length]
+                length -= start
+        if length:
+            yield buffer[:length]
+    finally:
+        if len(_line_buffer_pool) < _LINE_BUFFER_POOL_SIZE:
+            _line_buffer_pool.append(buffer)
+
+# Top-level fields read from the final state frame
+_FINAL_FIELDS = ("final_report", "cost_tracking")
+
+def _extract_final_fields(payload: memoryview) -> dict:
+    """Pull final_report and cost_tracking out of the final state frame in one pass"""
+    if ijson is None:
+        data = _loads(payload)
+        return {key: data[key] for key in _FINAL_FIELDS if key in data}
+    return {
+        key: value
+        for key, value in ijson.kvitems(io.BytesIO(payload), '', use_float=True)
+        if key in _FINAL_FIELDS
+    }
+
+def write_report_body(report_file: TextIO, final_report: Optional[str], duration: float, cost_tracking: Optional[dict]):
+    """Write the run summary and the report body after the file header"""
+    report_file.write(f"Duration: {duration:.1f} seconds\n")
+    if cost_tracking:
+        report_file.write(f"Total Cost: ${cost_tracking.get('total_cost', 0):.4f}\n")
+    report_file.write("\n---\n\n")
+    report_file.write(final_report or "No report generated")
+
+def create_session() -> aiohttp.ClientSession:
+    """Create a client session that keeps its connection alive between runs"""
+    return aiohttp.ClientSession(
+        # Large read buffer so long SSE frames drain without backpressure
+        read_bufsize=4 * 1024 * 1024,
+        timeout=aiohttp.ClientTimeout(total=300),
+        connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=60)
+    )
+
+async def check_api(session: aiohttp.ClientSession) -> bool:
+    """Check that the local API is reachable using the shared session"""
+    print("Checking API availability...")
+    try:
+        async with session.head(f"{API_BASE_URL}/docs", timeout=aiohttp.ClientTimeout(total=2)):
+            print("✅ API is running")
+            return True
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        print("❌ API is not running!")
+        print("\nPlease start the API server with:")
+        print("uvx --refresh --from 'langgraph-cli[inmem]' --with-editable . --python 3.11 langgraph dev --allow-blocking")
+        return False
+
+async def run_research(session: Optional[aiohttp.ClientSession] = None):
     """Run a simple research query and display results with cost tracking"""
     
+    # Reuse the caller's session when given so repeated runs share a connection
+    if session is None:
+        async with create_session() as session:
+            return await run_research(session)
+    
+    if not await check_api(session):
+        return
+    
     print("🔬 Open Deep Research - Simple API Demo")
     print("=" * 60)
     print(f"Topic: {RESEARCH_TOPIC}")
@@ -56,128 +166,144 @@ async def run_research():
     
     try:
         # Make the API request
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=300)) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    print(f"❌ API Error {response.status}: {error_text}")
-                    return
-                
-                # Process the streaming response
-                final_report = None
-                research_notes = []
-                cost_tracking = None
+        async with session.post(url, json=payload) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                print(f"❌ API Error {response.status}: {error_text}")
+                return
+            
+            # Process the streaming response
+            report_preview = None
+            report_length = 0
+            notes_count = 0
+            cost_tracking = None
+            report_written = False
+            duration = None
+            
+            # Open the output file up front so the report goes straight to disk
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = f"research_output_{timestamp}.md"
+            with open(output_file, 'w', buffering=65536) as report_file:
+                report_file.write(f"# Research Report: {RESEARCH_TOPIC}\n\n")
+                report_file.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 
-                async for line in response.content:
-                    if not line:
-                        continue
-                    
-                    line_str = line.decode('utf-8').strip()
-                    if line_str.startswith('data:'):
-                        data_str = line_str.split(':', 1)[1].strip()
-                        try:
-                            data = json.loads(data_str)
-                            
-                            # Collect research notes
-                            if "notes" in data and data["notes"]:
-                                research_notes.extend(data["notes"])
-                                print(f"📝 Collected {len(data['notes'])} research notes")
-                            
-                            # Get final report
-                            if "final_report" in data:
-                                final_report = data["final_report"]
-                                print(f"✅ Final report received ({len(final_report)} characters)")
-                            
-                            # Extract cost tracking data
-                            if "cost_tracking" in data and data["cost_tracking"]:
-                                cost_tracking = data["cost_tracking"]
+                # aclosing returns the line buffer to the pool as soon as we stop reading
+                async with contextlib.aclosing(iter_sse_lines(response)) as lines:
+                    async for line in lines:
+                        # Parse SSE payloads straight from the raw bytes
+                        if line.startswith(_DATA_PREFIX):
+                            # Zero-copy view of the payload; key checks run on the line
+                            payload = memoryview(line)[_PREFIX_LEN:]
+                            try:
+                                # Pull the fields we need from the final state frame
+                                # in a single pass
+                                if b'"final_report"' in line:
+                                    fields = _extract_final_fields(payload)
+                                    final_report = fields.get("final_report")
+                                    cost_tracking = fields.get("cost_tracking") or cost_tracking
+                                    del fields
+                                    if final_report is not None and not report_written:
+                                        print(f"✅ Final report received ({len(final_report)} characters)")
+                                        # Write the report out now and keep only a preview; the
+                                        # file and the console both report this duration
+                                        duration = time.time() - start_time
+                                        write_report_body(report_file, final_report, duration, cost_tracking)
+                                        report_written = True
+                                        report_preview = final_report[:1000]
+                                        report_length = len(final_report)
+                                        del final_report
+                                    # The final report is the last event we need
+                                    if report_written and cost_tracking is not None:
+                                        break
+                                    continue
                                 
-                        except json.JSONDecodeError:
-                            continue
-                
-                # Calculate total time
-                end_time = time.time()
-                duration = end_time - start_time
-                
-                # Display results
-                print("\n" + "=" * 60)
-                print("📊 RESEARCH RESULTS")
-                print("=" * 60)
-                
-                if final_report:
-                    print("\n📄 Final Report Preview (first 1000 characters):")
-                    print("-" * 40)
-                    print(final_report[:1000])
-                    if len(final_report) > 1000:
-                        print(f"\n... (truncated, full report is {len(final_report)} characters)")
-                    print("-" * 40)
+                                # Skip the parse for frames without any field we use
+                                if b'"notes"' not in line and b'"cost_tracking"' not in line:
+                                    continue
+                                
+                                data = _loads(payload)
+                                
+                                # Collect research notes
+                                if "notes" in data and data["notes"]:
+                                    notes_count += len(data["notes"])
+                                    print(f"📝 Collected {len(data['notes'])} research notes")
+                                
+                                # Extract cost tracking data
+                                if "cost_tracking" in data and data["cost_tracking"]:
+                                    cost_tracking = data["cost_tracking"]
+                                    
+                            except _JSON_ERRORS:
+                                continue
                 
-                # Display timing information
-                print(f"\n⏱️  Total Time: {duration:.1f} seconds")
-                print(f"📝 Research Notes Collected: {len(research_notes)}")
+                # Calculate total time unless the report already fixed it
+                if duration is None:
+                    end_time = time.time()
+                    duration = end_time - start_time
                 
-                # Display cost tracking if available
-                if cost_tracking:
-                    print("\n💰 COST TRACKING")
-                    print("-" * 40)
-                    print(f"Total Cost: ${cost_tracking.get('total_cost', 0):.4f}")
-                    
-                    if "by_model" in cost_tracking:
-                        print("\nCost by Model:")
-                        for model, stats in cost_tracking["by_model"].items():
-                            print(f"  {model}:")
-                            print(f"    - Calls: {stats.get('calls', 0)}")
-                            print(f"    - Cost: ${stats.get('cost', 0):.4f}")
-                    
-                    if "total_input_tokens" in cost_tracking:
-                        print(f"\nToken Usage:")
-                        print(f"  - Input Tokens: {cost_tracking['total_input_tokens']:,}")
-                        print(f"  - Output Tokens: {cost_tracking['total_output_tokens']:,}")
-                        print(f"  - Total Tokens: {cost_tracking['total_input_tokens'] + cost_tracking['total_output_tokens']:,}")
-                    
-                    print("-" * 40)
-                else:
-                    print("\n💰 Cost tracking data not available")
+                # Save a placeholder if no report arrived
+                if not report_written:
+                    write_report_body(report_file, None, duration, cost_tracking)
+            
+            # Display results
+            print("\n" + "=" * 60)
+            print("📊 RESEARCH RESULTS")
+            print("=" * 60)
+            
+            if report_preview:
+                print("\n📄 Final Report Preview (first 1000 characters):")
+                print("-" * 40)
+                print(report_preview)
+                if report_length > 1000:
+                    print(f"\n... (truncated, full report is {report_length} characters)")
+                print("-" * 40)
+            
+            # Display timing information
+            print(f"\n⏱️  Total Time: {duration:.1f} seconds")
+            print(f"📝 Research Notes Collected: {notes_count}")
+            
+            # Display cost tracking if available
+            if cost_tracking:
+                print("\n💰 COST TRACKING")
+                print("-" * 40)
+                print(f"Total Cost: ${cost_tracking.get('total_cost', 0):.4f}")
                 
-                # Save full report to file
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_file = f"research_output_{timestamp}.md"
-                with open(output_file, 'w') as f:
-                    f.write(f"# Research Report: {RESEARCH_TOPIC}\n\n")
-                    f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write(f"Duration: {duration:.1f} seconds\n")
-                    if cost_tracking:
-                        f.write(f"Total Cost: ${cost_tracking.get('total_cost', 0):.4f}\n")
-                    f.write("\n---\n\n")
-                    f.write(final_report or "No report generated")
+                if "by_model" in cost_tracking:
+                    print("\nCost by Model:")
+                    for model, stats in cost_tracking["by_model"].items():
+                        print(f"  {model}:")
+                        print(f"    - Calls: {stats.get('calls', 0)}")
+                        print(f"    - Cost: ${stats.get('cost', 0):.4f}")
                 
-                print(f"\n💾 Full report saved to: {output_file}")
+                if "total_input_tokens" in cost_tracking:
+                    print(f"\nToken Usage:")
+                    print(f"  - Input Tokens: {cost_tracking['total_input_tokens']:,}")
+                    print(f"  - Output Tokens: {cost_tracking['total_output_tokens']:,}")
+                    print(f"  - Total Tokens: {cost_tracking['total_input_tokens'] + cost_tracking['total_output_tokens']:,}")
                 
+                print("-" * 40)
+            else:
+                print("\n💰 Cost tracking data not available")
+            
+            print(f"\n💾 Full report saved to: {output_file}")
+            
     except asyncio.TimeoutError:
         print("❌ Request timed out after 5 minutes")
     except Exception as e:
         print(f"❌ Error: {type(e).__name__}: {str(e)}")
 
+async def _run():
+    """Open a shared session and run the research with it"""
+    async with create_session() as session:
+        await run_research(session)
+
 def main():
     """Main entry point"""
     print("🔍 Open Deep Research - Local API Demo")
     print("This demo shows how to use the local API with cost tracking")
     print()
     
-    # Check if API is running
-    print("Checking API availability...")
-    try:
-        import requests
-        response = requests.get(f"{API_BASE_URL}/docs", timeout=2)
-        print("✅ API is running")
-    except Exception:
-        print("❌ API is not running!")
-        print("\nPlease start the API server with:")
-        print("uvx --refresh --from 'langgraph-cli[inmem]' --with-editable . --python 3.11 langgraph dev --allow-blocking")
-        return
-    
     # Run the research
-    asyncio.run(run_research())
+    asyncio.run(_run())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -4,12 +4,15 @@ Executive-level visualization of deep research hypotheses for due diligence
 """
 
 import streamlit as st
-import json
+import aiofiles
+import asyncio
+import simdjson
+import html
 import os
 from pathlib import Path
+from string import Template
 from datetime import datetime
 from typing import Dict, List, Optional
-import pandas as pd
 
 # Page configuration
 st.set_page_config(
@@ -20,7 +23,7 @@ st.set_page_config(
 )
 
 # Custom CSS for executive presentation
-st.markdown("""
+_CSS = """
 <style>
     /* Main title styling */
     .main-header {
@@ -112,6 +115,12 @@ st.markdown("""
         color: #1e40af;
     }
     
+    .card-badges {
+        display: flex;
+        align-items: center;
+        margin-bottom: 0.5rem;
+    }
+    
     .priority-indicator {
         display: inline-block;
         padding: 0.25rem 0.5rem;
@@ -184,7 +193,7 @@ st.markdown("""
         color: white !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
 # Constants
 OUTPUT_BASE_DIR = Path("output/hypothesis_research")
@@ -201,19 +210,53 @@ SECTION_NAMES = {
     "forward_looking_risks_catalysts": "Forward-Looking Risks"
 }
 
+# Hypothesis card templates, compiled once at import
+_CARD_TPL = Template(
+    '<div class="hypothesis-card">'
+    '<div class="hypothesis-title">📊 $title</div>'
+    '$statement'
+    '$rationale'
+    '<div class="card-badges">'
+    '<span class="impact-badge impact-$impact_class">Impact: $impact</span>'
+    '<span class="priority-indicator">Priority: $priority/5</span>'
+    '</div>'
+    '$questions'
+    '</div>'
+)
+_STATEMENT_TPL = Template('<div class="hypothesis-statement">$text</div>')
+_RATIONALE_TPL = Template('<div class="rationale">💡 $text</div>')
+_QUESTIONS_TPL = Template('<div class="questions-section"><strong>Research Questions:</strong>$items</div>')
+_QUESTION_TPL = Template('<div class="question-item">$text</div>')
+
+@st.cache_data(ttl=300, show_spinner=False)
 def load_available_companies() -> List[str]:
     """Load list of companies with hypothesis data"""
     companies = []
     if OUTPUT_BASE_DIR.exists():
         for company_dir in OUTPUT_BASE_DIR.iterdir():
             if company_dir.is_dir():
-                # Check if there are hypothesis files
-                hypothesis_files = list(company_dir.glob("*_hypotheses_list_*.json"))
-                if hypothesis_files:
+                # Check if there is at least one hypothesis file
+                if next(company_dir.glob("*_hypotheses_list_*.json"), None) is not None:
                     company_name = company_dir.name.replace("_", " ").title()
                     companies.append(company_name)
     return sorted(companies)
 
+async def _read_hypotheses(file_path: Path) -> List:
+    """Read a single hypothesis file and return its hypotheses"""
+    async with aiofiles.open(file_path, 'rb') as f:
+        raw = await f.read()
+    # Only materialize the hypotheses subtree. Each call gets its own parser:
+    # Streamlit sessions run on separate threads, and a parser can't be reused
+    # while proxies from its previous document are still alive
+    doc = simdjson.Parser().parse(raw)
+    hyps = doc.get('hypotheses', [])
+    return hyps.as_list() if hasattr(hyps, 'as_list') else hyps
+
+async def _read_all_hypotheses(file_paths: List[Path]) -> List[List]:
+    """Read several hypothesis files concurrently"""
+    return await asyncio.gather(*(_read_hypotheses(p) for p in file_paths))
+
+@st.cache_data(ttl=300, show_spinner=False)
 def load_company_hypotheses(company_name: str) -> Dict[str, List]:
     """Load all hypotheses for a company organized by section"""
     company_slug = company_name.lower().replace(" ", "_")
@@ -222,74 +265,86 @@ def load_company_hypotheses(company_name: str) -> Dict[str, List]:
     hypotheses_by_section = {}
     
     if company_dir.exists():
-        # Load all hypothesis files
-        hypothesis_files = sorted(company_dir.glob("*_hypotheses_list_*.json"))
+        # Match hypothesis files to their sections
+        section_files = []
+        for file_path in sorted(company_dir.glob("*_hypotheses_list_*.json")):
+            # Extract section name from filename ({section_key}_hypotheses_list_*)
+            section_key = file_path.stem.split("_hypotheses_list_", 1)[0]
+            if section_key in SECTION_NAMES:
+                section_files.append((section_key, file_path))
         
-        for file_path in hypothesis_files:
-            # Extract section name from filename
-            filename = file_path.stem
-            for section_key in SECTION_NAMES.keys():
-                if filename.startswith(section_key):
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-                        hypotheses_by_section[section_key] = data.get('hypotheses', [])
-                    break
+        # Read all files concurrently
+        results = asyncio.run(_read_all_hypotheses([file_path for _, file_path in section_files]))
+        for (section_key, _), hyps in zip(section_files, results):
+            hypotheses_by_section[section_key] = hyps
     
     return hypotheses_by_section
 
-def display_hypothesis_card(hypothesis: Dict, index: int):
-    """Display a single hypothesis in a card format"""
-    with st.container():
-        st.markdown(f'<div class="hypothesis-card">', unsafe_allow_html=True)
-        
-        # Title
-        title = hypothesis.get('title', f'Hypothesis {index}')
-        st.markdown(f'<div class="hypothesis-title">📊 {title}</div>', unsafe_allow_html=True)
-        
-        # Hypothesis statement
-        statement = hypothesis.get('hypothesis', '')
-        if statement:
-            st.markdown(f'<div class="hypothesis-statement">{statement}</div>', unsafe_allow_html=True)
-        
-        # Rationale
-        rationale = hypothesis.get('rationale', '')
-        if rationale:
-            st.markdown(f'<div class="rationale">💡 {rationale}</div>', unsafe_allow_html=True)
-        
-        # Impact and Priority badges
-        col1, col2, col3 = st.columns([2, 2, 8])
-        
-        with col1:
-            impact = hypothesis.get('potential_impact', 'Medium')
-            impact_class = f"impact-{impact.lower()}"
-            st.markdown(
-                f'<span class="impact-badge {impact_class}">Impact: {impact}</span>',
-                unsafe_allow_html=True
-            )
-        
-        with col2:
-            priority = hypothesis.get('research_priority', 3)
-            st.markdown(
-                f'<span class="priority-indicator">Priority: {priority}/5</span>',
-                unsafe_allow_html=True
-            )
-        
-        # Research questions
-        questions = hypothesis.get('testable_questions', [])
-        if questions:
-            st.markdown('<div class="questions-section">', unsafe_allow_html=True)
-            st.markdown("**Research Questions:**")
-            for question in questions:
-                st.markdown(f'<div class="question-item">{question}</div>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
+@st.cache_data(ttl=300, show_spinner=False)
+def load_section_metrics(company_name: str) -> Dict[str, Dict[str, int]]:
+    """Compute per-section hypothesis statistics for a company"""
+    import pandas as pd
+    
+    metrics = {}
+    for section_key, hyps in load_company_hypotheses(company_name).items():
+        df = pd.DataFrame(hyps)
+        metrics[section_key] = {
+            "total": len(df),
+            "high_impact": int(df["potential_impact"].eq("High").sum()) if "potential_impact" in df else 0,
+            "priority_1": int(df["research_priority"].eq(1).sum()) if "research_priority" in df else 0,
+        }
+    return metrics
+
+def render_hypothesis_card(hypothesis: Dict, index: int) -> str:
+    """Build the HTML for a single hypothesis card"""
+    # Hypothesis statement
+    statement = hypothesis.get('hypothesis', '')
+    statement_html = _STATEMENT_TPL.substitute(text=html.escape(str(statement))) if statement else ''
+    
+    # Rationale
+    rationale = hypothesis.get('rationale', '')
+    rationale_html = _RATIONALE_TPL.substitute(text=html.escape(str(rationale))) if rationale else ''
+    
+    # Research questions
+    questions = hypothesis.get('testable_questions', [])
+    questions_html = _QUESTIONS_TPL.substitute(
+        items="".join(_QUESTION_TPL.substitute(text=html.escape(str(q))) for q in questions)
+    ) if questions else ''
+    
+    impact = str(hypothesis.get('potential_impact', 'Medium'))
+    return _CARD_TPL.substitute(
+        title=html.escape(str(hypothesis.get('title', f'Hypothesis {index}'))),
+        statement=statement_html,
+        rationale=rationale_html,
+        impact=html.escape(impact),
+        impact_class=html.escape(impact.lower()),
+        priority=html.escape(str(hypothesis.get('research_priority', 3))),
+        questions=questions_html,
+    )
+
+def display_hypothesis_cards(hypotheses: List[Dict]):
+    """Display a list of hypotheses as cards with a single markdown call"""
+    st.markdown(
+        "".join(render_hypothesis_card(hypothesis, i) for i, hypothesis in enumerate(hypotheses, 1)),
+        unsafe_allow_html=True
+    )
+
+def _inject_css():
+    """Inject the executive presentation styles into the page"""
+    st.markdown(_CSS, unsafe_allow_html=True)
 
 def main():
+    _inject_css()
+    
     # Header
     st.markdown('<h1 class="main-header">M&A Hypothesis Research Platform</h1>', unsafe_allow_html=True)
     st.markdown('<p class="subtitle">Deep due diligence insights through AI-powered hypothesis generation and research</p>', unsafe_allow_html=True)
     
+    # Allow forcing a re-scan of the output directory
+    with st.sidebar:
+        if st.button("🔄 Refresh", help="Re-scan the output directory for new hypothesis data"):
+            st.cache_data.clear()
+    
     # Load available companies
     companies = load_available_companies()
     
@@ -335,8 +390,7 @@ def main():
                     "Count": len(hyps)
                 })
             
-            df = pd.DataFrame(section_stats)
-            st.dataframe(df, hide_index=True, use_container_width=True)
+            st.dataframe(section_stats, hide_index=True, use_container_width=True)
     
     # Main content area
     if not hypotheses_data:
@@ -371,35 +425,32 @@ def main():
             
             if hypotheses:
                 st.markdown(f'<div class="section-header">{section_name}</div>', unsafe_allow_html=True)
-                
-                for i, hypothesis in enumerate(hypotheses, 1):
-                    display_hypothesis_card(hypothesis, i)
+                display_hypothesis_cards(hypotheses)
     
     # Individual section tabs
+    section_metrics = load_section_metrics(selected_company)
     for tab, section_key in zip(tabs[1:], tab_sections[1:]):
         with tab:
             hypotheses = hypotheses_data.get(section_key, [])
             
             if hypotheses:
                 # Section statistics
+                metrics = section_metrics[section_key]
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("Total Hypotheses", len(hypotheses))
+                    st.metric("Total Hypotheses", metrics["total"])
                 
                 with col2:
-                    high_impact = sum(1 for h in hypotheses if h.get('potential_impact') == 'High')
-                    st.metric("High Impact", high_impact)
+                    st.metric("High Impact", metrics["high_impact"])
                 
                 with col3:
-                    priority_1 = sum(1 for h in hypotheses if h.get('research_priority') == 1)
-                    st.metric("Priority 1", priority_1)
+                    st.metric("Priority 1", metrics["priority_1"])
                 
                 st.markdown("---")
                 
                 # Display hypotheses
-                for i, hypothesis in enumerate(hypotheses, 1):
-                    display_hypothesis_card(hypothesis, i)
+                display_hypothesis_cards(hypotheses)
             else:
                 st.info(f"No hypotheses found for {SECTION_NAMES[section_key]}")
     
@@ -1,14 +1,81 @@
 """Cost tracking for LLM API calls in Open Deep Research"""
 
+import io
+import sys
 import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
 from dataclasses import dataclass, field
-import tiktoken
+from functools import lru_cache
+import numpy as np
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
-@dataclass
+
+# Model name fragments and their tiktoken encoding, checked in order
+_MODEL_ENCODINGS = (
+    ("gpt-4", "cl100k_base"),
+    ("gpt-3.5", "cl100k_base"),
+    ("claude", "cl100k_base"),  # Approximate
+    ("gemini", "cl100k_base"),  # Approximate
+)
+
+# Encodings loaded so far (None if unavailable), and the encoding name
+# resolved for each model
+_ENCODINGS: Dict[str, Optional["tiktoken.Encoding"]] = {}
+_MODEL_TO_ENCODING: Dict[str, str] = {}
+
+# Texts at least this long are tokenized directly instead of cached; the bound
+# covers formatted system prompts while keeping the cache to a few MB
+_CACHE_MAX_TEXT_LEN = 16384
+
+
+def _get_encoding(name: str) -> Optional["tiktoken.Encoding"]:
+    """Return a tiktoken encoding, or None if it cannot be loaded"""
+    if name not in _ENCODINGS:
+        # Decide once whether the encoding is usable instead of on every call
+        try:
+            _ENCODINGS[name] = tiktoken.get_encoding(name) if tiktoken is not None else None
+        except Exception:
+            _ENCODINGS[name] = None
+    return _ENCODINGS[name]
+
+
+@lru_cache(maxsize=256)
+def _encode_len(text: str, encoding_name: str) -> int:
+    """Count tokens for a text, memoized for repeated prompts"""
+    return len(_get_encoding(encoding_name).encode_ordinary(text))
+
+
+def _count_tokens(text: str, encoding_name: str) -> int:
+    """Count tokens with plain BPE, memoizing short texts"""
+    # No special-token scan; texts containing literal markers like
+    # <|endoftext|> are counted as ordinary text
+    if len(text) < _CACHE_MAX_TEXT_LEN:
+        return _encode_len(text, encoding_name)
+    return len(_get_encoding(encoding_name).encode_ordinary(text))
+
+
+def _encoding_name_for(model: str) -> str:
+    """Resolve the encoding name for a model, scanning fragments only on first sight"""
+    model = str(model)
+    name = _MODEL_TO_ENCODING.get(model)
+    if name is None:
+        name = "cl100k_base"  # default
+        model_lower = model.lower()
+        for key, enc in _MODEL_ENCODINGS:
+            if key in model_lower:
+                name = enc
+                break
+        _MODEL_TO_ENCODING[model] = name
+    return name
+
+
+@dataclass(slots=True, frozen=True)
 class TokenUsage:
     """Track token usage for a single call"""
     model: str
@@ -19,158 +86,212 @@ class TokenUsage:
     task: str = ""
     
 
+# Layout of a single tracked call
+_RECORD_DTYPE = np.dtype([
+    ("model", np.int32),
+    ("task", np.int32),
+    ("input_tokens", np.int64),
+    ("output_tokens", np.int64),
+    ("timestamp", np.float64),
+    ("duration", np.float64),
+])
+_INITIAL_CAPACITY = 1024
+
+# Costs are accumulated as integers in 1e-12 USD units
+_COST_UNITS_PER_USD = 10**12
+
+
+def _name_index(name: str, names: List[str], index: Dict[str, int]) -> int:
+    """Return the index of a name, appending it on first sight"""
+    i = index.get(name)
+    if i is None:
+        i = index[name] = len(names)
+        names.append(name)
+    return i
+
+
 @dataclass 
 class CostTracker:
     """Track costs across all LLM calls"""
-    usage_records: List[TokenUsage] = field(default_factory=list)
     start_time: float = field(default_factory=time.time)
+    # Per-call records in one contiguous array; models and tasks are stored as
+    # indices into the name lists below
+    _records: np.ndarray = field(default_factory=lambda: np.empty(_INITIAL_CAPACITY, dtype=_RECORD_DTYPE), init=False, repr=False, compare=False)
+    _count: int = field(default=0, init=False, repr=False, compare=False)
+    _models: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
+    _model_index: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _tasks: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
+    _task_index: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    
+    @property
+    def usage_records(self) -> Tuple[TokenUsage, ...]:
+        """Return a read-only snapshot of the tracked calls; record new calls with add_call"""
+        return tuple(
+            TokenUsage(
+                model=self._models[record["model"]],
+                input_tokens=int(record["input_tokens"]),
+                output_tokens=int(record["output_tokens"]),
+                timestamp=float(record["timestamp"]),
+                duration=float(record["duration"]),
+                task=self._tasks[record["task"]]
+            )
+            for record in self._records[:self._count]
+        )
     
     def estimate_tokens(self, text: str, model: str) -> int:
         """Estimate token count for text using tiktoken"""
-        try:
-            # Map model names to tiktoken encoding
-            encoding_map = {
-                "gpt-4": "cl100k_base",
-                "gpt-3.5": "cl100k_base",
-                "claude": "cl100k_base",  # Approximate
-                "gemini": "cl100k_base",  # Approximate
-            }
-            
-            # Find the right encoding
-            encoding_name = "cl100k_base"  # default
-            for key, enc in encoding_map.items():
-                if key in model.lower():
-                    encoding_name = enc
-                    break
-            
-            encoding = tiktoken.get_encoding(encoding_name)
-            return len(encoding.encode(text))
-        except Exception:
+        encoding_name = _encoding_name_for(model)
+        if _get_encoding(encoding_name) is None:
             # Fallback: estimate ~4 chars per token
             return len(text) // 4
+        return _count_tokens(text, encoding_name)
     
     def estimate_messages_tokens(self, messages: List[BaseMessage], model: str) -> int:
         """Estimate tokens for a list of messages"""
-        total = 0
-        for msg in messages:
-            # Add message content
-            total += self.estimate_tokens(str(msg.content), model)
-            # Add overhead for message structure (role, etc)
-            total += 4  # Approximate overhead
-        return total
+        texts = [str(msg.content) for msg in messages]
+        encoding_name = _encoding_name_for(model)
+        if _get_encoding(encoding_name) is None:
+            # Fallback: estimate ~4 chars per token
+            total = sum(len(text) // 4 for text in texts)
+        else:
+            # Histories are a handful of messages, so a plain loop beats spinning
+            # up tiktoken's batch thread pool on every call
+            total = sum(_count_tokens(text, encoding_name) for text in texts)
+        # Add overhead for message structure (role, etc)
+        return total + 4 * len(messages)  # Approximate overhead
     
     def add_call(self, model: str, input_tokens: int, output_tokens: int, 
                  duration: float, task: str = ""):
         """Add a single API call to tracking"""
-        self.usage_records.append(TokenUsage(
-            model=model,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            timestamp=time.time(),
-            duration=duration,
-            task=task
-        ))
+        # Double the record array when it is full
+        if self._count == len(self._records):
+            records = np.empty(2 * len(self._records), dtype=_RECORD_DTYPE)
+            records[:self._count] = self._records
+            self._records = records
+        # Callers may pass None or non-str names; interned names let the
+        # index lookups hit the identity fast path
+        model = sys.intern(str(model))
+        task = sys.intern(str(task)) if task else ""
+        self._records[self._count] = (
+            _name_index(model, self._models, self._model_index),
+            _name_index(task, self._tasks, self._task_index),
+            input_tokens,
+            output_tokens,
+            time.time(),
+            duration
+        )
+        self._count += 1
     
     def reset(self):
         """Reset the tracker for a new session"""
-        self.usage_records = []
+        # Keep the allocated record array for reuse
+        self._count = 0
+        self._models.clear()
+        self._model_index.clear()
+        self._tasks.clear()
+        self._task_index.clear()
         self.start_time = time.time()
     
     def get_cost_summary(self, model_pricing: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
         """Calculate total costs based on pricing configuration"""
+        records = self._records[:self._count]
+        input_tokens = records["input_tokens"]
+        output_tokens = records["output_tokens"]
+        durations = records["duration"]
+        
+        # Models are already indexed in order of first appearance; tasks are
+        # regrouped so that an empty task and "unknown" share one group
+        models = self._models
+        model_idx = records["model"]
+        task_labels = [task or "unknown" for task in self._tasks]
+        tasks = list(dict.fromkeys(task_labels))
+        task_pos = {task: i for i, task in enumerate(tasks)}
+        task_idx = np.array([task_pos[task] for task in task_labels], dtype=np.intp)[records["task"]]
+        
+        # Calculate cost for every record from per-model pricing
+        default_pricing = model_pricing.get("default", {"input": 1.0, "output": 2.0})
+        pricing = [model_pricing.get(model, default_pricing) for model in models]
+        # Prices are USD per million tokens; quantize them to micro-USD so that
+        # tokens * price is an exact integer number of 1e-12 USD units
+        input_price = np.array([round(p["input"] * 1_000_000) for p in pricing], dtype=np.int64)
+        output_price = np.array([round(p["output"] * 1_000_000) for p in pricing], dtype=np.int64)
+        costs = input_tokens * input_price[model_idx] + output_tokens * output_price[model_idx]
+        
         summary = {
-            "total_input_tokens": 0,
-            "total_output_tokens": 0,
-            "total_cost": 0.0,
-            "total_duration": 0.0,
-            "by_model": {},
-            "by_task": {}
+            "total_input_tokens": int(input_tokens.sum()),
+            "total_output_tokens": int(output_tokens.sum()),
+            "total_cost": int(costs.sum()) / _COST_UNITS_PER_USD,
+            "total_duration": float(durations.sum()),
+            "by_model": self._group_totals(models, model_idx, input_tokens, output_tokens, costs, durations),
+            "by_task": self._group_totals(tasks, task_idx, input_tokens, output_tokens, costs, durations)
         }
         
-        for record in self.usage_records:
-            # Get pricing for this model
-            pricing = model_pricing.get(record.model, model_pricing.get("default", {"input": 1.0, "output": 2.0}))
-            
-            # Calculate cost for this record
-            input_cost = (record.input_tokens / 1_000_000) * pricing["input"]
-            output_cost = (record.output_tokens / 1_000_000) * pricing["output"]
-            total_cost = input_cost + output_cost
-            
-            # Update totals
-            summary["total_input_tokens"] += record.input_tokens
-            summary["total_output_tokens"] += record.output_tokens
-            summary["total_cost"] += total_cost
-            summary["total_duration"] += record.duration
-            
-            # Track by model
-            if record.model not in summary["by_model"]:
-                summary["by_model"][record.model] = {
-                    "input_tokens": 0,
-                    "output_tokens": 0,
-                    "cost": 0.0,
-                    "calls": 0,
-                    "duration": 0.0
-                }
-            summary["by_model"][record.model]["input_tokens"] += record.input_tokens
-            summary["by_model"][record.model]["output_tokens"] += record.output_tokens
-            summary["by_model"][record.model]["cost"] += total_cost
-            summary["by_model"][record.model]["calls"] += 1
-            summary["by_model"][record.model]["duration"] += record.duration
-            
-            # Track by task
-            task = record.task or "unknown"
-            if task not in summary["by_task"]:
-                summary["by_task"][task] = {
-                    "input_tokens": 0,
-                    "output_tokens": 0,
-                    "cost": 0.0,
-                    "calls": 0,
-                    "duration": 0.0
-                }
-            summary["by_task"][task]["input_tokens"] += record.input_tokens
-            summary["by_task"][task]["output_tokens"] += record.output_tokens
-            summary["by_task"][task]["cost"] += total_cost
-            summary["by_task"][task]["calls"] += 1
-            summary["by_task"][task]["duration"] += record.duration
-        
         # Add timing info
         summary["total_time"] = time.time() - self.start_time
         summary["timestamp"] = datetime.now().isoformat()
         
         return summary
     
+    @staticmethod
+    def _group_totals(names: List[str], idx: np.ndarray, input_tokens: np.ndarray, output_tokens: np.ndarray,
+                      costs: np.ndarray, durations: np.ndarray) -> Dict[str, Dict[str, Any]]:
+        """Sum usage per group, one vectorized reduction per column"""
+        k = len(names)
+        group_input = np.bincount(idx, weights=input_tokens, minlength=k)
+        group_output = np.bincount(idx, weights=output_tokens, minlength=k)
+        # Integer costs are summed exactly rather than through float weights
+        group_cost = np.zeros(k, dtype=np.int64)
+        np.add.at(group_cost, idx, costs)
+        group_calls = np.bincount(idx, minlength=k)
+        group_duration = np.bincount(idx, weights=durations, minlength=k)
+        return {
+            name: {
+                "input_tokens": int(group_input[i]),
+                "output_tokens": int(group_output[i]),
+                "cost": int(group_cost[i]) / _COST_UNITS_PER_USD,
+                "calls": int(group_calls[i]),
+                "duration": float(group_duration[i])
+            }
+            for i, name in enumerate(names)
+        }
+    
     def print_summary(self, model_pricing: Dict[str, Dict[str, float]]):
         """Print a formatted cost summary"""
         summary = self.get_cost_summary(model_pricing)
+        # Build the whole report first and emit it with a single write
+        buf = io.StringIO()
         
-        print("\n" + "="*60)
-        print("COST & PERFORMANCE SUMMARY")
-        print("="*60)
+        buf.write("\n" + "="*60 + "\n")
+        buf.write("COST & PERFORMANCE SUMMARY\n")
+        buf.write("="*60 + "\n")
         
         # Overall stats
-        print(f"\nTotal Time: {summary['total_time']:.1f}s")
-        print(f"Total API Time: {summary['total_duration']:.1f}s")
-        print(f"Total Cost: ${summary['total_cost']:.3f}")
-        print(f"Total Tokens: {summary['total_input_tokens']:,} input, {summary['total_output_tokens']:,} output")
+        buf.write(f"\nTotal Time: {summary['total_time']:.1f}s\n")
+        buf.write(f"Total API Time: {summary['total_duration']:.1f}s\n")
+        buf.write(f"Total Cost: ${summary['total_cost']:.3f}\n")
+        buf.write(f"Total Tokens: {summary['total_input_tokens']:,} input, {summary['total_output_tokens']:,} output\n")
         
         # By model breakdown
         if summary["by_model"]:
-            print("\nBy Model:")
+            buf.write("\nBy Model:\n")
             for model, stats in summary["by_model"].items():
-                print(f"  {model}:")
-                print(f"    Calls: {stats['calls']}")
-                print(f"    Tokens: {stats['input_tokens']:,} in / {stats['output_tokens']:,} out")
-                print(f"    Cost: ${stats['cost']:.3f}")
-                print(f"    Time: {stats['duration']:.1f}s")
+                buf.write(f"  {model}:\n")
+                buf.write(f"    Calls: {stats['calls']}\n")
+                buf.write(f"    Tokens: {stats['input_tokens']:,} in / {stats['output_tokens']:,} out\n")
+                buf.write(f"    Cost: ${stats['cost']:.3f}\n")
+                buf.write(f"    Time: {stats['duration']:.1f}s\n")
         
         # By task breakdown
         if summary["by_task"] and len(summary["by_task"]) > 1:
-            print("\nBy Task:")
+            buf.write("\nBy Task:\n")
             for task, stats in summary["by_task"].items():
                 if task != "unknown":
-                    print(f"  {task}:")
-                    print(f"    Calls: {stats['calls']}")
-                    print(f"    Cost: ${stats['cost']:.3f}")
-                    print(f"    Time: {stats['duration']:.1f}s")
+                    buf.write(f"  {task}:\n")
+                    buf.write(f"    Calls: {stats['calls']}\n")
+                    buf.write(f"    Cost: ${stats['cost']:.3f}\n")
+                    buf.write(f"    Time: {stats['duration']:.1f}s\n")
+        
+        buf.write("="*60 + "\n")
         
-        print("="*60)
\ No newline at end of file
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
@@ -0,0 +1,81 @@
+import math
+import random
+
+import pytest
+
+from open_deep_research.cost_tracker import CostTracker
+
+MODEL_PRICING = {
+    "gpt-4o": {"input": 2.5, "output": 10.0},
+    "claude-3-5-sonnet": {"input": 3.0, "output": 15.0},
+    "default": {"input": 1.0, "output": 2.0},
+}
+
+
+def _reference_summary(records, model_pricing):
+    """Per-record cost loop as CostTracker.get_cost_summary originally computed it"""
+    summary = {
+        "total_input_tokens": 0,
+        "total_output_tokens": 0,
+        "total_cost": 0.0,
+        "total_duration": 0.0,
+        "by_model": {},
+        "by_task": {}
+    }
+    for record in records:
+        pricing = model_pricing.get(record.model, model_pricing.get("default", {"input": 1.0, "output": 2.0}))
+        total_cost = (record.input_tokens / 1_000_000) * pricing["input"] + (record.output_tokens / 1_000_000) * pricing["output"]
+        summary["total_input_tokens"] += record.input_tokens
+        summary["total_output_tokens"] += record.output_tokens
+        summary["total_cost"] += total_cost
+        summary["total_duration"] += record.duration
+        for group, key in (("by_model", record.model), ("by_task", record.task or "unknown")):
+            stats = summary[group].setdefault(key, {"input_tokens": 0, "output_tokens": 0, "cost": 0.0, "calls": 0, "duration": 0.0})
+            stats["input_tokens"] += record.input_tokens
+            stats["output_tokens"] += record.output_tokens
+            stats["cost"] += total_cost
+            stats["calls"] += 1
+            stats["duration"] += record.duration
+    return summary
+
+
+def _assert_summaries_match(actual, expected):
+    assert list(actual) == list(expected)
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            _assert_summaries_match(actual[key], value)
+        elif isinstance(value, float):
+            assert math.isclose(actual[key], value, rel_tol=1e-9, abs_tol=1e-9), key
+        else:
+            assert actual[key] == value, key
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cost_summary_matches_per_record_loop(seed):
+    rng = random.Random(seed)
+    tracker = CostTracker()
+    for _ in range(3000):
+        tracker.add_call(
+            rng.choice(["gpt-4o", "claude-3-5-sonnet", "unpriced-model"]),
+            rng.randint(0, 200_000),
+            rng.randint(0, 20_000),
+            rng.random() * 10,
+            rng.choice(["", "research", "compress", "final_report"]),
+        )
+
+    summary = tracker.get_cost_summary(MODEL_PRICING)
+    for key in ("total_time", "timestamp"):
+        summary.pop(key)
+
+    _assert_summaries_match(summary, _reference_summary(tracker.usage_records, MODEL_PRICING))
+
+
+def test_usage_records_snapshot_is_read_only():
+    tracker = CostTracker()
+    tracker.add_call("gpt-4o", 10, 5, 0.1, "research")
+
+    records = tracker.usage_records
+    assert len(records) == 1
+    assert records[0].model == "gpt-4o"
+    with pytest.raises(AttributeError):
+        records.append(records[0])